@@ -1,24 +1,43 @@
+import asyncio
+import hashlib
 import json
 import os
 import re
-from dataclasses import dataclass
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, fields, replace
+from fnmatch import fnmatchcase
+from functools import cached_property, lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, FrozenSet, List, Optional, Tuple, Union
 
 import click
-import git
-from litellm import completion
-from rich.console import Console
-from rich.panel import Panel
-from rich.syntax import Syntax
-from rich.table import Table
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+# git, rich and litellm are slow to import, so they are imported where they are used
+# to keep commands like `config get` and `--help` fast
 
 # Constants
 DEFAULT_MODEL = "gpt-4o"
 DEFAULT_BASE_BRANCH = "main"
 DEFAULT_TEMPERATURE = 0.0
 CONFIG_FILENAME = ".coderev.config"
+CACHE_FILENAME = ".coderev.cache.db"
+CACHE_MAX_AGE_DAYS = 30
 DEFAULT_BASE_BRANCHES = ["main", "master"]
+DEFAULT_CONCURRENCY = 4
+DIFF_CACHE_SIZE = 64
+DEFAULT_MAX_DIFF_BYTES = 60000
+# Vendored and generated files left out of full-branch diffs
+EXCLUDED_DIFF_PATTERNS = ["**/node_modules/**", "**/*.min.js", "**/*.lock"]
 DEFAULT_SYSTEM_MESSAGE = (
     "You are an experienced code reviewer. Analyze the code changes and provide "
     "constructive feedback following the given guidelines. Format your response "
@@ -39,6 +58,9 @@ DEFAULT_REVIEW_INSTRUCTIONS = """**Review Guidelines:**
   - Suggest improvements only when they add significant value
   - Be specific in your feedback and recommendations"""
 
+_DIFF_FILE_RE = re.compile(r"^diff --git ", re.MULTILINE)
+_HUNK_HEADER_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@(.*)$")
+
 
 @dataclass
 class Config:
@@ -47,68 +69,420 @@ class Config:
     base_branch: str = DEFAULT_BASE_BRANCH
     system_message: str = DEFAULT_SYSTEM_MESSAGE
     review_instructions: str = DEFAULT_REVIEW_INSTRUCTIONS
+    max_diff_bytes: int = DEFAULT_MAX_DIFF_BYTES
+    stream: bool = False
 
     def to_dict(self):
-        return {
-            "model": self.model,
-            "temperature": self.temperature,
-            "base_branch": self.base_branch,
-            "system_message": self.system_message,
-            "review_instructions": self.review_instructions,
-        }
+        return {field.name: getattr(self, field.name) for field in _CONFIG_FIELDS}
 
     @classmethod
     def from_dict(cls, data: Dict):
-        # Handle type conversion for temperature
-        if "temperature" in data:
+        # Unknown keys are ignored and missing ones keep their defaults
+        values = {}
+        for field in _CONFIG_FIELDS:
+            if field.name not in data:
+                continue
+            value = data[field.name]
+            # Handle type conversion for numeric and boolean fields
+            if field.type in (int, float):
+                try:
+                    value = field.type(value)
+                except (ValueError, TypeError):
+                    value = field.default
+            elif field.type is bool:
+                if isinstance(value, str):
+                    value = _parse_bool(value)
+                    if value is None:
+                        value = field.default
+                else:
+                    value = bool(value)
+            values[field.name] = value
+
+        return cls(**values)
+
+
+# Config fields are looked up once rather than on every load and save
+_CONFIG_FIELDS = fields(Config)
+# Config field name -> type, used to convert values given on the command line
+_CONFIG_FIELD_TYPES = {field.name: field.type for field in _CONFIG_FIELDS}
+_TRUE_VALUES = ("1", "true", "yes", "on")
+_FALSE_VALUES = ("0", "false", "no", "off")
+
+
+def _parse_bool(value: str) -> Optional[bool]:
+    """Parse a boolean written as text, None when it is not one"""
+    if value.lower() in _TRUE_VALUES:
+        return True
+    if value.lower() in _FALSE_VALUES:
+        return False
+    return None
+
+
+def _coerce_config_value(key: str, value: str) -> Union[str, int, float, bool]:
+    """Convert a command line value to the type of the Config field key"""
+    field_type = _CONFIG_FIELD_TYPES[key]
+    if field_type is bool:
+        parsed = _parse_bool(value)
+        if parsed is not None:
+            return parsed
+        click.echo(f"Error: {key} must be true or false", err=True)
+        raise click.ClickException(f"Invalid {key} value")
+
+    if field_type in (int, float):
+        try:
+            return field_type(value)
+        except ValueError as err:
+            kind = "a whole number" if field_type is int else "a valid number"
+            click.echo(f"Error: {key} must be {kind}", err=True)
+            raise click.ClickException(f"Invalid {key} value") from err
+
+    return value
+
+
+def _json_loads(data: Union[str, bytes]) -> Any:
+    """Parse JSON with orjson when it is installed
+
+    orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch the latter.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps(data: Any) -> bytes:
+    """Serialize JSON indented by two spaces, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2).encode("utf-8")
+
+
+# Config path -> (mtime_ns, size, config) of the last load, so unchanged files aren't re-parsed
+_CONFIG_CACHE: Dict[str, Tuple[int, int, Config]] = {}
+
+
+def load_config(directory: Union[str, Path]) -> Config:
+    """Load the configuration stored in directory, falling back to defaults"""
+    config_path = Path(directory) / CONFIG_FILENAME
+    try:
+        stat = config_path.stat()
+    except FileNotFoundError:
+        return Config()
+
+    key = str(config_path)
+    cached = _CONFIG_CACHE.get(key)
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        # Callers modify their config, so hand out copies of the cached one
+        return replace(cached[2])
+
+    try:
+        config = Config.from_dict(_json_loads(config_path.read_bytes()))
+    except FileNotFoundError:
+        return Config()
+    except Exception as err:
+        click.secho(f"Warning: Could not load config file: {err}", fg="yellow", err=True)
+        return Config()
+    _CONFIG_CACHE[key] = (stat.st_mtime_ns, stat.st_size, config)
+    return replace(config)
+
+
+def _config_file_mode(config_path: Path) -> int:
+    """Get the permission bits for a config file written to config_path"""
+    try:
+        return stat.S_IMODE(config_path.stat().st_mode)
+    except FileNotFoundError:
+        # os.umask can only be read by setting it
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def save_config(directory: Union[str, Path], config: Config) -> None:
+    """Save the configuration to directory"""
+    config_path = Path(directory) / CONFIG_FILENAME
+    # Write to a uniquely named temporary file and rename it over the config, so a
+    # concurrent reader never sees a partly written file and concurrent writers never
+    # share a temporary file
+    tmp_path: Optional[str] = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=config_path.parent, prefix=CONFIG_FILENAME + ".")
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(_json_dumps(config.to_dict()))
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        # mkstemp creates the file readable by the owner only, keep the mode the config
+        # has, or would get from a plain open()
+        os.chmod(tmp_path, _config_file_mode(config_path))
+        os.replace(tmp_path, config_path)
+        _CONFIG_CACHE.pop(str(config_path), None)
+    except Exception as err:
+        if tmp_path is not None:
             try:
-                data["temperature"] = float(data["temperature"])
-            except (ValueError, TypeError):
-                data["temperature"] = DEFAULT_TEMPERATURE
-
-        return cls(
-            model=data.get("model", DEFAULT_MODEL),
-            temperature=data.get("temperature", DEFAULT_TEMPERATURE),
-            base_branch=data.get("base_branch", DEFAULT_BASE_BRANCH),
-            system_message=data.get("system_message", DEFAULT_SYSTEM_MESSAGE),
-            review_instructions=data.get("review_instructions", DEFAULT_REVIEW_INSTRUCTIONS),
-        )
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+        raise click.ClickException(f"Error saving config: {str(err)}") from err
+
+
+@dataclass
+class ReviewJob:
+    branch_name: str
+    base_branch: Optional[str] = None
+    files: Optional[List[str]] = None
+    system_message: Optional[str] = None
+    review_instructions: Optional[str] = None
+    # Pre-computed diff, fetched from git when not given
+    diff: Optional[str] = None
+    # Files changed in the pre-computed diff
+    changed_files: Optional[List[str]] = None
+
+
+def split_diff(diff: str) -> List[str]:
+    """Split a multi-file diff into one diff per file"""
+    starts = [match.start() for match in _DIFF_FILE_RE.finditer(diff)]
+    return [diff[start:end] for start, end in zip(starts, starts[1:] + [len(diff)])]
+
+
+def _pathspec_matches(pathspec: str, paths: List[str]) -> bool:
+    """Check whether a git pathspec matches any of paths, as `git diff -- <pathspec>` would"""
+    if pathspec.startswith(":"):
+        # Magic pathspecs are left for git to interpret
+        return True
+    while pathspec.startswith("./"):
+        pathspec = pathspec[2:]
+    pathspec = pathspec.rstrip("/")
+    if pathspec in ("", "."):
+        return bool(paths)
+    prefix = pathspec + "/"
+    # Git wildcards match across directories, like fnmatch's
+    return any(
+        path == pathspec or path.startswith(prefix) or fnmatchcase(path, pathspec) for path in paths
+    )
+
+
+def _is_blank_context(line: str) -> bool:
+    return line[:1] == " " and not line.strip()
+
+
+def _hunk_range(start: int, count: int) -> str:
+    # Like git, leave out a count of one
+    return str(start) if count == 1 else f"{start},{count}"
+
+
+def _trim_hunk(header: str, body: List[str]) -> List[str]:
+    """Drop blank context lines at the edges of a hunk, renumbering its header to match"""
+    match = _HUNK_HEADER_RE.match(header)
+    if not match:
+        return [header, *body]
+
+    # A diff ending in a newline leaves an empty line after its last hunk
+    tail = len(body)
+    while tail and not body[tail - 1]:
+        tail -= 1
+    start = 0
+    while start < tail and _is_blank_context(body[start]):
+        start += 1
+    end = tail
+    while end > start and _is_blank_context(body[end - 1]):
+        end -= 1
+    if start == 0 and end == tail:
+        return [header, *body]
+
+    old_start, old_count, new_start, new_count = (
+        int(value) if value is not None else 1 for value in match.group(1, 2, 3, 4)
+    )
+    trimmed = start + tail - end
+    old_start, old_count = old_start + start, old_count - trimmed
+    new_start, new_count = new_start + start, new_count - trimmed
+    # An empty range starts at the line before it
+    if old_count == 0:
+        old_start -= 1
+    if new_count == 0:
+        new_start -= 1
+
+    header = (
+        f"@@ -{_hunk_range(old_start, old_count)} +{_hunk_range(new_start, new_count)} @@"
+        f"{match.group(5)}"
+    )
+    return [header, *body[start:end], *body[tail:]]
+
+
+def compact_diff(diff: str) -> str:
+    """Drop diff lines that cost prompt tokens without helping the review
+
+    Removes the `index` header lines and blank context lines at the edges of each hunk,
+    rewriting the hunk headers so line numbers still match.
+    """
+    lines: List[str] = []
+    header: Optional[str] = None
+    body: List[str] = []
+    for line in diff.split("\n"):
+        if line.startswith(("diff --git ", "@@")):
+            if header is not None:
+                lines.extend(_trim_hunk(header, body))
+            header, body = (line, []) if line.startswith("@@") else (None, [])
+            if header is not None:
+                continue
+        elif header is not None:
+            body.append(line)
+            continue
+        elif line.startswith("index "):
+            continue
+        lines.append(line)
+
+    if header is not None:
+        lines.extend(_trim_hunk(header, body))
+    return "\n".join(lines)
+
+
+def dedupe_file_diffs(
+    file_diffs: List[Tuple[str, str]],
+) -> Tuple[List[Tuple[str, str]], List[int]]:
+    """Drop file diffs whose hunks repeat those of an earlier file
+
+    Returns the unique (file, diff) pairs and, for every input pair, the index of the
+    unique pair that covers it.
+    """
+    seen: Dict[bytes, int] = {}
+    unique = []
+    positions = []
+    for file, file_diff in file_diffs:
+        # Compare from the first hunk on, the header always differs by file name
+        hunks_start = file_diff.find("\n@@")
+        hunks = file_diff[hunks_start:] if hunks_start != -1 else file_diff
+        key = hashlib.blake2b(hunks.encode("utf-8"), digest_size=16).digest()
+        if key not in seen:
+            seen[key] = len(unique)
+            unique.append((file, file_diff))
+        positions.append(seen[key])
+    return unique, positions
+
+
+def pack_file_diffs(
+    file_diffs: List[Tuple[str, str]], max_bytes: int
+) -> List[List[Tuple[str, str]]]:
+    """Greedily pack (file, diff) pairs into buckets of at most max_bytes of diff
+
+    A single file diff larger than max_bytes gets a bucket of its own.
+    """
+    buckets = []
+    bucket, bucket_size = [], 0
+    for file, file_diff in file_diffs:
+        size = len(file_diff.encode("utf-8"))
+        if bucket and bucket_size + size > max_bytes:
+            buckets.append(bucket)
+            bucket, bucket_size = [], 0
+        bucket.append((file, file_diff))
+        bucket_size += size
+    if bucket:
+        buckets.append(bucket)
+    return buckets
 
 
 class GitHandler:
     def __init__(self, repo_path: str = "."):
+        import git
+
         try:
             self.repo = git.Repo(repo_path)
         except git.InvalidGitRepositoryError as err:
             raise click.ClickException("Not a git repository") from err
+        # Diffs keyed by the commit SHAs they were taken from, see _run_diff
+        self._cached_diff = lru_cache(maxsize=DIFF_CACHE_SIZE)(self._git_diff)
+
+    def invalidate(self) -> None:
+        """Forget cached branches and diffs, e.g. after the repository was modified"""
+        self._cached_diff.cache_clear()
+        self.forget_branches()
+
+    def forget_branches(self) -> None:
+        """Forget the cached branch list, diffs stay valid as they are keyed by commit"""
+        self.__dict__.pop("_branch_names", None)
+        self.__dict__.pop("_branch_name_set", None)
+        self.__dict__.pop("default_base_branch", None)
 
     def get_current_branch(self) -> str:
         return self.repo.active_branch.name
 
-    def get_default_base_branch(self) -> str:
+    @cached_property
+    def _branch_names(self) -> List[str]:
+        return [branch.name for branch in self.repo.heads]
+
+    @cached_property
+    def _branch_name_set(self) -> FrozenSet[str]:
+        # Membership checks hash instead of scanning every head
+        return frozenset(self._branch_names)
+
+    @cached_property
+    def default_base_branch(self) -> str:
         """Detect the default base branch (main or master)"""
-        # First try to get the base branch from the existing branches
+        # The heads are read from the refs in-process, so no git rev-parse is needed
         for base in DEFAULT_BASE_BRANCHES:
-            if base in self.repo.heads:
-                try:
-                    # Verify the branch exists and is valid
-                    self.repo.git.rev_parse(f"{base}")
-                    return base
-                except git.GitCommandError:
-                    continue
+            if base in self._branch_name_set:
+                return base
 
         # If no valid base branch is found
         raise click.ClickException(
             f"No default base branch found. Expected one of: {', '.join(DEFAULT_BASE_BRANCHES)}"
         )
 
+    def get_default_base_branch(self) -> str:
+        """Detect the default base branch (main or master)"""
+        return self.default_base_branch
+
+    def resolve_base_branch(self, base_branch: Optional[str] = None) -> str:
+        """Resolve the base branch once, falling back to main/master detection"""
+        if base_branch and (
+            base_branch != DEFAULT_BASE_BRANCH or base_branch in self._branch_name_set
+        ):
+            return base_branch
+        return self.default_base_branch
+
+    def _unmatched_files(self, revision: str, files: List[str]) -> List[str]:
+        """Get the pathspecs in files that match no file tracked in a revision"""
+        output = self.repo.git.ls_tree("-r", "--name-only", "-z", revision)
+        tracked = [path for path in output.split("\0") if path]
+        return [pathspec for pathspec in files if not _pathspec_matches(pathspec, tracked)]
+
     def get_branch_diff(
         self, branch_name: str, base_branch: Optional[str] = None, files: Optional[List[str]] = None
     ) -> str:
         """Get diff between specified branch and base branch, optionally filtered by files"""
+        return self._diff(branch_name, base_branch, files)
+
+    def get_diff_and_files(
+        self, branch_name: str, base_branch: Optional[str] = None, files: Optional[List[str]] = None
+    ) -> Tuple[List[str], str]:
+        """Get changed files and diff between branches with a single git diff call"""
+        output = self._diff(branch_name, base_branch, files, "--patch-with-raw", "-z")
+        if not output.startswith(":"):
+            return [], output
+
+        # NUL-separated raw status entries come first and end with an empty field.
+        # Each entry is ":<modes> <shas> <status>" followed by its path, or by the
+        # source and destination paths for renames and copies.
+        raw, _, patch = output.partition("\0\0")
+        changed_files = []
+        fields = raw.split("\0")
+        i = 0
+        while i < len(fields):
+            status = fields[i].rsplit(" ", 1)[-1]
+            i += 2 if status[:1] in ("R", "C") else 1
+            changed_files.append(fields[i])
+            i += 1
+        return changed_files, patch
+
+    def _diff(
+        self,
+        branch_name: str,
+        base_branch: Optional[str],
+        files: Optional[List[str]],
+        *options: str,
+    ) -> str:
+        import git
+
         try:
             if base_branch is None:
-                base_branch = self.get_default_base_branch()
+                base_branch = self.default_base_branch
 
             if branch_name == base_branch:
                 existing_branches = [b.name for b in self.repo.heads if b.name != base_branch]
@@ -126,30 +500,40 @@ class GitHandler:
                 raise click.ClickException(f"Cannot review the main branch against itself.\n{hint}")
 
             # Ensure both branches exist
-            if branch_name not in self.repo.heads:
+            if branch_name not in self._branch_name_set:
                 raise click.ClickException(f"Branch '{branch_name}' not found")
 
+            # Limit the diff to specific files when requested, otherwise skip generated files
+            if files:
+                paths = ["--", *files]
+            else:
+                paths = ["--", *(f":(exclude,glob){pattern}" for pattern in EXCLUDED_DIFF_PATTERNS)]
+            options = ("--find-renames", *options)
             try:
-                # Try to get the diff
-                if files:
-                    # Get diff for specific files
-                    diff = self.repo.git.diff(f"{base_branch}...{branch_name}", "--", *files)
-                else:
-                    # Get diff for all files
-                    diff = self.repo.git.diff(f"{base_branch}...{branch_name}")
+                diff = self._run_diff(branch_name, base_branch, *options, *paths)
             except git.GitCommandError as err:
                 # If the first attempt fails with main, try master
                 if base_branch == DEFAULT_BASE_BRANCH and "unknown revision" in str(err):
                     base_branch = "master"
-                    if files:
-                        diff = self.repo.git.diff(f"{base_branch}...{branch_name}", "--", *files)
-                    else:
-                        diff = self.repo.git.diff(f"{base_branch}...{branch_name}")
+                    diff = self._run_diff(branch_name, base_branch, *options, *paths)
                 else:
                     raise
 
             if not diff:
                 if files:
+                    # Only look for files that don't exist when nothing matched, so a
+                    # successful review never pays for listing the tree
+                    missing = self._unmatched_files(branch_name, files)
+                    if missing and base_branch in self._branch_name_set:
+                        # Files deleted on the branch only exist in the base branch
+                        missing = self._unmatched_files(base_branch, missing)
+                    # Report every missing file at once
+                    if len(missing) == 1:
+                        raise click.ClickException(f"File '{missing[0]}' not found in repository")
+                    if missing:
+                        raise click.ClickException(
+                            f"Files not found in repository: {', '.join(missing)}"
+                        )
                     raise click.ClickException(
                         f"No changes found between {branch_name} and {base_branch} "
                         f"for the specified files: {', '.join(files)}"
@@ -170,23 +554,64 @@ class GitHandler:
                 raise err
             raise click.ClickException(f"Error getting diff: {str(err)}") from err
 
+    def _commit_sha(self, revision: str) -> Optional[str]:
+        """Resolve a branch name to its commit SHA, or None when it isn't a branch
+
+        Reads the ref files rather than asking git, so keying the diff cache costs no
+        process. Other revisions are left for git diff to resolve, uncached.
+        """
+        from git.refs import SymbolicReference
+
+        for prefix in ("refs/heads/", "refs/remotes/"):
+            try:
+                return SymbolicReference.dereference_recursive(self.repo, prefix + revision)
+            except ValueError:
+                continue
+        return None
+
+    def _run_diff(self, branch_name: str, base_branch: str, *args: str) -> str:
+        """Run git diff base...branch, reusing the result while both commits are unchanged"""
+        branch_sha = self._commit_sha(branch_name)
+        base_sha = self._commit_sha(base_branch)
+        if branch_sha is None or base_sha is None:
+            # Let git report the unknown revision
+            return self._git_diff(None, None, f"{base_branch}...{branch_name}", *args)
+        if branch_sha == base_sha:
+            # Both point to the same commit, so there is nothing to diff
+            return ""
+        return self._cached_diff(branch_sha, base_sha, f"{base_branch}...{branch_name}", *args)
+
+    def _git_diff(self, branch_sha: Optional[str], base_sha: Optional[str], *args: str) -> str:
+        # The SHAs are not passed to git, they only key the diff cache. A branch already
+        # merged into the base needs no check of its own: base...branch diffs it to nothing
+        # Decode once, replacing invalid UTF-8 (e.g. latin-1 sources) so the diff can always be
+        # re-encoded for the size check and the response cache key
+        return self._run_git("diff", *args).decode("utf-8", errors="replace")
+
+    def _run_git(self, command: str, *args: str) -> bytes:
+        """Run a git command and return its raw output without decoding it"""
+        return getattr(self.repo.git, command)(*args, stdout_as_string=False)
+
     def get_changed_files(self, branch_name: str, base_branch: Optional[str] = None) -> List[str]:
         """Get list of files changed between branches"""
+        import git
+
         try:
             if base_branch is None:
-                base_branch = self.get_default_base_branch()
+                base_branch = self.default_base_branch
 
+            # -z separates names with NUL and leaves unusual paths unquoted
             try:
                 diff_files = self.repo.git.diff(
-                    f"{base_branch}...{branch_name}", "--name-only"
-                ).split("\n")
+                    f"{base_branch}...{branch_name}", "--name-only", "-z"
+                ).split("\0")
             except git.GitCommandError as err:
                 # If the first attempt fails with main, try master
                 if base_branch == DEFAULT_BASE_BRANCH and "unknown revision" in str(err):
                     base_branch = "master"
                     diff_files = self.repo.git.diff(
-                        f"{base_branch}...{branch_name}", "--name-only"
-                    ).split("\n")
+                        f"{base_branch}...{branch_name}", "--name-only", "-z"
+                    ).split("\0")
                 else:
                     raise
             # Filter out empty strings
@@ -198,69 +623,155 @@ class GitHandler:
 
     def list_branches(self) -> List[str]:
         """List all branches in the repository"""
-        return [branch.name for branch in self.repo.heads]
+        return list(self._branch_names)
+
+    def list_branches_with_shas(self) -> List[Tuple[str, str]]:
+        """List (name, short commit SHA) for all branches in a single pass over the heads"""
+        return [(head.name, head.commit.hexsha[:7]) for head in self.repo.heads]
+
+
+def _import_litellm() -> None:
+    import litellm  # noqa: F401
+
+
+def _start_litellm_import() -> "Future[None]":
+    """Import litellm on a daemon thread, so exiting early never waits for the import
+
+    An ImportError is left for the import where litellm is used to report, any other
+    error is set on the returned future.
+    """
+    future: Future[None] = Future()
+
+    def run() -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            _import_litellm()
+        except ImportError:
+            future.set_result(None)
+        except BaseException as err:
+            future.set_exception(err)
+        else:
+            future.set_result(None)
+
+    threading.Thread(target=run, name="coderev-import-litellm", daemon=True).start()
+    return future
+
+
+class ResponseCache:
+    """SQLite-backed store of LLM responses keyed by a hash of the full prompt
+
+    Responses older than max_age_days are pruned when the cache is first opened.
+    """
+
+    def __init__(self, path: Path, max_age_days: int = CACHE_MAX_AGE_DAYS):
+        self.path = path
+        self.max_age_days = max_age_days
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @staticmethod
+    def make_key(model: str, temperature: float, system_msg: str, user_msg: str) -> bytes:
+        return hashlib.blake2b(f"{model}|{temperature}|{system_msg}|{user_msg}".encode()).digest()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(str(self.path))
+            try:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS cache "
+                    "(key BLOB PRIMARY KEY, response TEXT, ts INTEGER)"
+                )
+                with conn:
+                    conn.execute(
+                        "DELETE FROM cache WHERE ts < ?",
+                        (int(time.time()) - self.max_age_days * 24 * 60 * 60,),
+                    )
+            except sqlite3.Error:
+                conn.close()
+                raise
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: bytes) -> Optional[str]:
+        row = self._connect().execute("SELECT response FROM cache WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: bytes, response: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, response, ts) VALUES (?, ?, ?)",
+                (key, response, int(time.time())),
+            )
 
 
 class CodeReviewer:
-    def __init__(self, repo_path: str = ".", debug: bool = False):
+    def __init__(
+        self, repo_path: str = ".", debug: bool = False, concurrency: int = DEFAULT_CONCURRENCY
+    ):
+        from rich.console import Console
+
         self.git = GitHandler(repo_path)
         self.console = Console()
         self.debug = debug or os.getenv("CODEREV_DEBUG_ENABLED", "false").lower() == "true"
+        self.concurrency = concurrency
+        self.use_cache = True
+        self.cache = ResponseCache(Path(self.git.repo.working_dir) / CACHE_FILENAME)
         self.config = self._load_config()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._llm_import: Optional[Future[None]] = None
+
+    def invalidate(self) -> None:
+        """Forget cached git state, e.g. after a command that modified the repository"""
+        self.git.invalidate()
 
     def _load_config(self) -> Config:
-        config_path = Path(self.git.repo.working_dir) / CONFIG_FILENAME
-        if not config_path.exists():
-            return Config()
-        try:
-            with open(config_path) as f:
-                data = json.load(f)
-            return Config.from_dict(data)
-        except Exception as err:
-            self.console.print(f"[yellow]Warning: Could not load config file: {err}[/]")
-            return Config()
+        return load_config(self.git.repo.working_dir)
 
     def _save_config(self):
-        config_path = Path(self.git.repo.working_dir) / CONFIG_FILENAME
-        try:
-            with open(config_path, "w") as f:
-                json.dump(self.config.to_dict(), f, indent=2)
-        except Exception as err:
-            raise click.ClickException(f"Error saving config: {str(err)}") from err
+        save_config(self.git.repo.working_dir, self.config)
 
-    def _debug_print(self, title: str, content: str):
+    def _debug_print(self, title: str, content: str, lexer: str = "python"):
         if self.debug:
+            if not self.console.is_terminal:
+                # Skip syntax highlighting when the output is piped or captured
+                click.echo(f"--- {title} ---\n{content}")
+                return
+
+            from rich.panel import Panel
+            from rich.syntax import Syntax
+
             self.console.print(
                 Panel(
-                    Syntax(content, "python", theme="monokai"),
+                    Syntax(content, lexer, theme="monokai"),
                     title=f"[blue]{title}[/]",
                     border_style="blue",
                 )
             )
 
     def _format_review_content(self, content: str) -> str:
-        """Format the review content for display"""
+        """Format the review content for display, returning it stripped of surrounding whitespace"""
         try:
             content = content.strip()
 
-            # Find the outermost JSON code block
-            start_pattern = r"^\s*```(?:json)?\s*\{"
-            end_pattern = r"\}\s*```\s*$"
+            # Find the outermost code block markers in a single scan from each end
+            start = content.find("```")
+            end = content.rfind("```")
 
-            start_match = re.search(start_pattern, content, re.MULTILINE)
-            end_match = re.search(end_pattern, content, re.MULTILINE)
-
-            if start_match and end_match:
-                # Extract everything between the outermost code block markers
-                json_content = content[start_match.start() : end_match.end()]
+            if start < end:
                 # Remove the ```json prefix and ``` suffix
-                json_content = re.sub(r"^\s*```(?:json)?\s*", "", json_content)
-                json_content = re.sub(r"\s*```\s*$", "", json_content)
+                json_content = content[start + 3 : end]
+                if json_content.startswith("json"):
+                    json_content = json_content[4:]
+                json_content = json_content.strip()
+                if not json_content.startswith("{"):
+                    return content
 
                 try:
                     # Parse the JSON and extract the response
-                    data = json.loads(json_content)
-                    return data.get("response", json_content)
+                    data = _json_loads(json_content)
+                    response = data.get("response", json_content)
+                    return response.strip() if isinstance(response, str) else response
                 except json.JSONDecodeError:
                     if self.debug:
                         self.console.print("[yellow]Warning: Failed to parse JSON content[/]")
@@ -273,40 +784,115 @@ class CodeReviewer:
                 self.console.print(f"[yellow]Warning: Error formatting content: {str(err)}[/]")
             return content
 
-    def review_branch(
-        self,
-        branch_name: str,
-        base_branch: Optional[str] = None,
-        files: Optional[List[str]] = None,
-        system_message: Optional[str] = None,
-        review_instructions: Optional[str] = None,
-    ) -> str:
-        try:
-            if not base_branch:
-                try:
-                    base_branch = self.config.base_branch
-                except AttributeError:
-                    base_branch = self.git.get_default_base_branch()
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Get the semaphore limiting concurrent LLM requests on the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
 
-            # Get changed files if files parameter is not provided
-            changed_files = self.git.get_changed_files(branch_name, base_branch)
+    def _warm_up_llm(self) -> None:
+        """Start importing litellm while git computes the diff, once per reviewer
 
-            # Add files information to the message
-            files_info = ""
-            if files:
-                files_info = "\nReviewing specific files:\n" + "\n".join(f"- {f}" for f in files)
+        `_complete` only waits for the import when the response cache can't answer.
+        """
+        if self._llm_import is None:
+            self._llm_import = _start_litellm_import()
+
+    def _disable_cache(self, err: Exception) -> None:
+        self.use_cache = False
+        if self.debug:
+            self.console.print(f"[yellow]Warning: Response cache unavailable: {err}[/]")
+
+    async def _complete(self, system_msg: str, user_msg: str, stream: bool = False) -> str:
+        """Send the review prompt to the LLM and return the raw response content
+
+        When streaming, tokens are echoed to stdout as they arrive.
+        """
+        if self.use_cache:
+            key = ResponseCache.make_key(
+                self.config.model, self.config.temperature, system_msg, user_msg
+            )
+            try:
+                cached = self.cache.get(key)
+            except sqlite3.Error as err:
+                self._disable_cache(err)
             else:
-                files_info = "\nChanged files:\n" + "\n".join(f"- {f}" for f in changed_files)
+                if cached is not None:
+                    if stream:
+                        click.echo(cached)
+                    return cached
 
-            diff = self.git.get_branch_diff(branch_name, base_branch, files)
+        if self._llm_import is not None:
+            try:
+                await asyncio.wrap_future(self._llm_import)
+            except Exception:
+                # Try the import again with the next review
+                self._llm_import = None
+                raise
+        from litellm import acompletion
+
+        async with self._get_semaphore():
+            response = await acompletion(
+                model=self.config.model,
+                temperature=self.config.temperature,
+                messages=[
+                    {"role": "system", "content": system_msg},
+                    {"role": "user", "content": user_msg},
+                ],
+                drop_params=True,
+                stream=stream,
+            )
+            if stream:
+                parts = []
+                async for chunk in response:
+                    token = chunk.choices[0].delta.content
+                    if token:
+                        click.echo(token, nl=False)
+                        parts.append(token)
+                click.echo()
+                content = "".join(parts)
+            else:
+                content = response.choices[0].message.content
+
+        if self.use_cache and content:
+            try:
+                self.cache.set(key, content)
+            except sqlite3.Error as err:
+                self._disable_cache(err)
 
-            # Use review instructions in the same priority as system message:
-            # 1. Explicitly provided via --review-instructions
-            # 2. Configured in .coderev.config
-            # 3. Default review instructions
-            effective_instructions = review_instructions or self.config.review_instructions
+        return content
+
+    def _build_prompt(self, job: ReviewJob) -> Tuple[str, str]:
+        """Build the system and user messages for a review job"""
+        # Resolve the base branch once so the git calls below don't re-derive it
+        base_branch = self.git.resolve_base_branch(job.base_branch or self.config.base_branch)
+
+        if job.diff is None:
+            # Get the changed files and the diff from a single git call
+            changed_files, diff = self.git.get_diff_and_files(
+                job.branch_name, base_branch, job.files
+            )
+        else:
+            changed_files, diff = job.changed_files or job.files or [], job.diff
+
+        diff = compact_diff(diff)
+
+        # Add files information to the message
+        files_info = ""
+        if job.files:
+            files_info = "\nReviewing specific files:\n" + "\n".join(f"- {f}" for f in job.files)
+        else:
+            files_info = "\nChanged files:\n" + "\n".join(f"- {f}" for f in changed_files)
 
-            user_msg = f"""Reviewing changes in branch '{branch_name}' compared to '{base_branch}'.
+        # Use review instructions in the same priority as system message:
+        # 1. Explicitly provided via --review-instructions
+        # 2. Configured in .coderev.config
+        # 3. Default review instructions
+        effective_instructions = job.review_instructions or self.config.review_instructions
+
+        user_msg = f"""Reviewing changes in branch '{job.branch_name}' compared to '{base_branch}'.
 {files_info}
 
 {effective_instructions}
@@ -315,33 +901,71 @@ Please review the following changes:
 
 {diff}"""
 
-            # Use system message in this priority:
-            # 1. Explicitly provided via --system-message
-            # 2. Configured in .coderev.config
-            # 3. Default system message
-            effective_system_msg = system_message or self.config.system_message
+        # Use system message in this priority:
+        # 1. Explicitly provided via --system-message
+        # 2. Configured in .coderev.config
+        # 3. Default system message
+        effective_system_msg = job.system_message or self.config.system_message
 
+        if self.debug:
             self._debug_print("System Message", effective_system_msg)
-            self._debug_print("User Message", user_msg)
+            self._debug_print("User Message", user_msg, lexer="diff")
 
-            response = completion(
-                model=self.config.model,
-                temperature=self.config.temperature,
-                messages=[
-                    {"role": "system", "content": effective_system_msg},
-                    {"role": "user", "content": user_msg},
-                ],
-                drop_params=True,
-            )
+        return effective_system_msg, user_msg
 
-            review_content = response.choices[0].message.content
+    def _finish_review(self, review_content: str) -> str:
+        if self.debug:
+            self._debug_print("Raw LLM Response", review_content)
 
-            if self.debug:
-                self._debug_print("Raw LLM Response", review_content)
+        # Format the content for display, the result is already stripped
+        return self._format_review_content(review_content)
 
-            # Format the content for display
-            formatted_content = self._format_review_content(review_content)
-            formatted_content = formatted_content.strip()
+    async def review_branch(
+        self,
+        branch_name: str,
+        base_branch: Optional[str] = None,
+        files: Optional[List[str]] = None,
+        system_message: Optional[str] = None,
+        review_instructions: Optional[str] = None,
+        stream: bool = False,
+    ) -> str:
+        try:
+            self._warm_up_llm()
+            base_branch = self.git.resolve_base_branch(base_branch or self.config.base_branch)
+            changed_files, diff = self.git.get_diff_and_files(branch_name, base_branch, files)
+
+            if len(diff.encode("utf-8")) > self.config.max_diff_bytes:
+                # Too large for one prompt, review groups of whole files concurrently
+                review = await self._review_chunked(
+                    branch_name,
+                    base_branch,
+                    changed_files,
+                    diff,
+                    system_message,
+                    review_instructions,
+                )
+                if stream:
+                    click.echo(review)
+                return review
+
+            system_msg, user_msg = self._build_prompt(
+                ReviewJob(
+                    branch_name,
+                    base_branch,
+                    files,
+                    system_message,
+                    review_instructions,
+                    diff=diff,
+                    changed_files=changed_files,
+                )
+            )
+            review_content = await self._complete(system_msg, user_msg, stream=stream)
+            formatted_content = self._finish_review(review_content)
+
+            if stream and formatted_content != review_content.strip():
+                # The streamed response was wrapped in JSON, show the extracted review too
+                click.echo()
+                click.echo(formatted_content)
 
             return formatted_content
         except click.ClickException as err:
@@ -349,16 +973,141 @@ Please review the following changes:
         except Exception as err:
             raise click.ClickException(f"Error during review: {str(err)}") from err
 
+    async def _review_chunked(
+        self,
+        branch_name: str,
+        base_branch: str,
+        changed_files: List[str],
+        diff: str,
+        system_message: Optional[str],
+        review_instructions: Optional[str],
+    ) -> str:
+        """Split a large diff into buckets of whole files under max_diff_bytes and review each"""
+        file_diffs = split_diff(diff)
+        if len(file_diffs) != len(changed_files):
+            # Can't match files to their diffs, so split only on file boundaries
+            changed_files = [""] * len(file_diffs)
+
+        # Identical changes (e.g. the same generated code in several files) are sent once
+        unique, positions = dedupe_file_diffs(list(zip(changed_files, file_diffs)))
+        buckets = pack_file_diffs(unique, self.config.max_diff_bytes)
+        bucket_of = [index for index, bucket in enumerate(buckets) for _ in bucket]
+        files_by_bucket: List[List[str]] = [[] for _ in buckets]
+        for file, position in zip(changed_files, positions):
+            if file:
+                files_by_bucket[bucket_of[position]].append(file)
+
+        jobs = []
+        for bucket, bucket_files in zip(buckets, files_by_bucket):
+            jobs.append(
+                ReviewJob(
+                    branch_name,
+                    base_branch,
+                    None,
+                    system_message,
+                    review_instructions,
+                    diff="".join(file_diff for _, file_diff in bucket),
+                    changed_files=bucket_files,
+                )
+            )
+
+        reviews = await self.review_many(jobs)
+        sections = []
+        for i, (job, review) in enumerate(zip(jobs, reviews), start=1):
+            title = f"Part {i} of {len(jobs)}"
+            if job.changed_files:
+                title += ": " + ", ".join(job.changed_files)
+            sections.append(f"## {title}\n\n{review}")
+        return "\n\n".join(sections)
+
+    async def review_branches(
+        self,
+        branch_names: List[str],
+        base_branch: Optional[str] = None,
+        system_message: Optional[str] = None,
+        review_instructions: Optional[str] = None,
+    ) -> AsyncIterator[Tuple[str, str, Optional[str]]]:
+        """Review several branches concurrently, yielding (branch, review, error) as each finishes
+
+        A branch that fails to review yields its error message instead of stopping the others.
+        """
+
+        async def review_one(branch_name: str) -> Tuple[str, str, Optional[str]]:
+            try:
+                review = await self.review_branch(
+                    branch_name,
+                    base_branch=base_branch,
+                    system_message=system_message,
+                    review_instructions=review_instructions,
+                )
+                return branch_name, review, None
+            except click.ClickException as err:
+                return branch_name, "", err.message
+
+        for next_review in asyncio.as_completed([review_one(name) for name in branch_names]):
+            yield await next_review
+
+    async def review_many(self, jobs: List[ReviewJob]) -> List[str]:
+        """Review several jobs with one repository handle, sending the LLM requests concurrently"""
+        try:
+            prompts = [self._build_prompt(job) for job in jobs]
+            responses = await asyncio.gather(
+                *[self._complete(system_msg, user_msg) for system_msg, user_msg in prompts]
+            )
+            return [self._finish_review(response) for response in responses]
+        except click.ClickException as err:
+            raise err
+        except Exception as err:
+            raise click.ClickException(f"Error during review: {str(err)}") from err
+
+    async def review_files(
+        self,
+        branch_name: str,
+        base_branch: Optional[str] = None,
+        files: Optional[List[str]] = None,
+        system_message: Optional[str] = None,
+        review_instructions: Optional[str] = None,
+    ) -> str:
+        """Review each changed file with its own LLM request, running the requests concurrently"""
+        self._warm_up_llm()
+        base_branch = self.git.resolve_base_branch(base_branch or self.config.base_branch)
+
+        # Get every file's changes from one git call and split them per file
+        changed_files, diff = self.git.get_diff_and_files(branch_name, base_branch, files)
+        file_diffs = split_diff(diff)
+        if len(file_diffs) != len(changed_files):
+            changed_files, file_diffs = [", ".join(changed_files)], [diff]
+
+        # Files with identical changes share one request and its review
+        unique, positions = dedupe_file_diffs(list(zip(changed_files, file_diffs)))
+        jobs = [
+            ReviewJob(
+                branch_name,
+                base_branch,
+                [file],
+                system_message,
+                review_instructions,
+                diff=file_diff,
+            )
+            for file, file_diff in unique
+        ]
+        reviews = await self.review_many(jobs)
+        return "\n\n".join(
+            f"## {file}\n\n{reviews[position]}" for file, position in zip(changed_files, positions)
+        )
+
     def list_branches(self) -> None:
         """Display branches in a formatted table"""
+        from rich.table import Table
+
         table = Table(title="Available Branches")
         table.add_column("Branch Name", style="cyan")
         table.add_column("Current", style="green")
+        table.add_column("Commit", style="dim")
 
         current_branch = self.git.get_current_branch()
-        for branch in self.git.list_branches():
-            is_current = "✓" if branch == current_branch else ""
-            table.add_row(branch, is_current)
+        for branch, short_sha in self.git.list_branches_with_shas():
+            table.add_row(branch, "✓" if branch == current_branch else "", short_sha)
 
         self.console.print(table)
 
@@ -369,11 +1118,23 @@ def cli():
     pass
 
 
+def _get_reviewer(debug: bool = False) -> CodeReviewer:
+    """Get the reviewer shared by a `coderev shell` session, or create a new one"""
+    ctx = click.get_current_context(silent=True)
+    reviewer = ctx.find_root().obj if ctx else None
+    if reviewer is None:
+        return CodeReviewer(debug=debug)
+    # Only ever turn debug on, so debug enabled through the environment stays on
+    if debug:
+        reviewer.debug = True
+    return reviewer
+
+
 @cli.command()
 def init():
     """Initialize Coderev in the current repository"""
     try:
-        reviewer = CodeReviewer()
+        reviewer = _get_reviewer()
         reviewer._save_config()
         click.echo("✨ Coderev initialized successfully!")
     except click.ClickException as err:
@@ -394,6 +1155,23 @@ def init():
 @click.option("--temperature", type=float, help="Set temperature for LLM (defaults to 0.0)")
 @click.option("--system-message", help="Custom system message for the LLM")
 @click.option("--review-instructions", help="Custom review guidelines")
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=DEFAULT_CONCURRENCY,
+    help=f"Maximum concurrent LLM requests (defaults to {DEFAULT_CONCURRENCY})",
+)
+@click.option("--no-cache", is_flag=True, help="Bypass the cached LLM responses")
+@click.option(
+    "--per-file",
+    is_flag=True,
+    help="Review each changed file in its own concurrent LLM request",
+)
+@click.option(
+    "--stream/--no-stream",
+    default=None,
+    help="Print the review as it is generated (defaults to the stream config, false)",
+)
 def review(
     branch_name: Optional[str],
     base_branch: Optional[str],
@@ -403,15 +1181,23 @@ def review(
     temperature: Optional[float],
     system_message: Optional[str],
     review_instructions: Optional[str],
+    concurrency: int,
+    no_cache: bool,
+    per_file: bool,
+    stream: Optional[bool],
 ):
     """Review changes in a branch compared to base branch (default: main/master)"""
     try:
-        reviewer = CodeReviewer(debug=debug)
+        reviewer = _get_reviewer(debug=debug)
+        reviewer.concurrency = concurrency
+        reviewer.use_cache = not no_cache
 
         if model:
             reviewer.config.model = model
         if temperature is not None:
             reviewer.config.temperature = temperature
+        if stream is None:
+            stream = reviewer.config.stream
 
         if not branch_name:
             branch_name = reviewer.git.get_current_branch()
@@ -420,14 +1206,105 @@ def review(
         # Convert files tuple to list if provided
         files_list = list(review_files) if review_files else None
 
-        review_content = reviewer.review_branch(
-            branch_name,
-            base_branch=base_branch,
-            files=files_list,
-            system_message=system_message,
-            review_instructions=review_instructions,
-        )
-        click.echo("\n" + review_content)
+        if per_file or len(review_files) > 1:
+            # Each file gets its own request, so there is no single response to stream
+            stream = False
+            review = reviewer.review_files(
+                branch_name,
+                base_branch=base_branch,
+                files=files_list,
+                system_message=system_message,
+                review_instructions=review_instructions,
+            )
+        else:
+            # Streaming is skipped when debug output needs the raw response
+            stream = stream and not reviewer.debug
+            review = reviewer.review_branch(
+                branch_name,
+                base_branch=base_branch,
+                files=files_list,
+                system_message=system_message,
+                review_instructions=review_instructions,
+                stream=stream,
+            )
+
+        if stream:
+            click.echo()
+        review_content = asyncio.run(review)
+        if not stream:
+            # Echo separately rather than copying the review into a new string
+            click.echo()
+            click.echo(review_content)
+    except click.ClickException as err:
+        click.echo(f"Error: {str(err)}", err=True)
+
+
+@cli.command(name="review-many")
+@click.argument("branch_names", nargs=-1)
+@click.option(
+    "--all", "all_branches", is_flag=True, help="Review every branch except the base branch"
+)
+@click.option("--base-branch", help="Base branch to compare against (defaults to main/master)")
+@click.option("--debug", is_flag=True, help="Enable debug mode (defaults to false)")
+@click.option("--model", help="Specify LLM model (defaults to gpt-4o)")
+@click.option("--temperature", type=float, help="Set temperature for LLM (defaults to 0.0)")
+@click.option("--system-message", help="Custom system message for the LLM")
+@click.option("--review-instructions", help="Custom review guidelines")
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=DEFAULT_CONCURRENCY,
+    help=f"Maximum concurrent LLM requests (defaults to {DEFAULT_CONCURRENCY})",
+)
+@click.option("--no-cache", is_flag=True, help="Bypass the cached LLM responses")
+def review_many(
+    branch_names: Tuple[str, ...],
+    all_branches: bool,
+    base_branch: Optional[str],
+    debug: bool,
+    model: Optional[str],
+    temperature: Optional[float],
+    system_message: Optional[str],
+    review_instructions: Optional[str],
+    concurrency: int,
+    no_cache: bool,
+):
+    """Review several branches concurrently, printing each review as it finishes"""
+    try:
+        reviewer = _get_reviewer(debug=debug)
+        reviewer.concurrency = concurrency
+        reviewer.use_cache = not no_cache
+
+        if model:
+            reviewer.config.model = model
+        if temperature is not None:
+            reviewer.config.temperature = temperature
+
+        branches = list(branch_names)
+        if all_branches:
+            base = reviewer.git.resolve_base_branch(base_branch or reviewer.config.base_branch)
+            branches += [
+                name
+                for name in reviewer.git.list_branches()
+                if name != base and name not in branches
+            ]
+        if not branches:
+            raise click.ClickException("Specify the branches to review or use --all")
+
+        async def print_reviews():
+            async for name, content, error in reviewer.review_branches(
+                branches,
+                base_branch=base_branch,
+                system_message=system_message,
+                review_instructions=review_instructions,
+            ):
+                click.echo(f"\n## {name}\n")
+                if error:
+                    click.echo(f"Error: {error}", err=True)
+                else:
+                    click.echo(content)
+
+        asyncio.run(print_reviews())
     except click.ClickException as err:
         click.echo(f"Error: {str(err)}", err=True)
 
@@ -436,12 +1313,57 @@ def review(
 def list_branches():
     """List all branches"""
     try:
-        reviewer = CodeReviewer()
+        reviewer = _get_reviewer()
         reviewer.list_branches()
     except click.ClickException as err:
         click.echo(f"Error: {str(err)}", err=True)
 
 
+@cli.command()
+def shell():
+    """Run coderev commands in one session, reusing the repository and caches"""
+    import shlex
+
+    try:
+        reviewer = CodeReviewer()
+    except click.ClickException as err:
+        click.echo(f"Error: {str(err)}", err=True)
+        return
+
+    click.echo("Enter coderev commands, e.g. `review feature-branch`. Type `exit` to quit.")
+    while True:
+        try:
+            line = click.prompt("coderev", prompt_suffix="> ")
+        except click.Abort:
+            break
+
+        try:
+            args = shlex.split(line)
+        except ValueError as err:
+            click.echo(f"Error: {str(err)}", err=True)
+            continue
+        if not args:
+            continue
+        if args[0] in ("exit", "quit"):
+            break
+        if args[0] == "shell":
+            click.echo("Error: Already in a coderev shell", err=True)
+            continue
+
+        # Undo option overrides from the previous command and pick up new branches
+        reviewer.config = reviewer._load_config()
+        reviewer.git.forget_branches()
+        debug = reviewer.debug
+        try:
+            cli.main(args=args, prog_name="coderev", standalone_mode=False, obj=reviewer)
+        except click.ClickException as err:
+            err.show()
+        except click.Abort:
+            click.echo("Aborted!", err=True)
+        finally:
+            reviewer.debug = debug
+
+
 @cli.group()
 def config():
     """Manage Coderev configuration"""
@@ -454,22 +1376,22 @@ def config():
 def config_set(key: str, value: str):
     """Set a configuration value"""
     try:
-        reviewer = CodeReviewer()
-        if hasattr(reviewer.config, key):
-            # Handle type conversion for known numeric fields
-            if key == "temperature":
-                try:
-                    value = float(value)
-                except ValueError as err:
-                    click.echo("Error: temperature must be a valid number", err=True)
-                    raise click.ClickException("Invalid temperature value") from err
-
-                if not (0 <= value <= 2):
-                    click.echo("Error: temperature must be between 0 and 2", err=True)
-                    raise click.ClickException("Temperature out of range")
-
-            setattr(reviewer.config, key, value)
-            reviewer._save_config()
+        # Config commands work on the current directory without opening the git repo
+        config = load_config(Path.cwd())
+        if key in _CONFIG_FIELD_TYPES:
+            # Store the value with its field's type so it isn't sent to the LLM as a string
+            value = _coerce_config_value(key, value)
+
+            if key == "max_diff_bytes" and value <= 0:
+                click.echo("Error: max_diff_bytes must be positive", err=True)
+                raise click.ClickException("max_diff_bytes out of range")
+
+            if key == "temperature" and not (0 <= value <= 2):
+                click.echo("Error: temperature must be between 0 and 2", err=True)
+                raise click.ClickException("Temperature out of range")
+
+            setattr(config, key, value)
+            save_config(Path.cwd(), config)
             click.echo(f"✓ Set {key}={value}")
         else:
             msg = f"Error: Unknown configuration key: {key}"
@@ -484,9 +1406,9 @@ def config_set(key: str, value: str):
 def config_get(key: str):
     """Get a configuration value"""
     try:
-        reviewer = CodeReviewer()
-        if hasattr(reviewer.config, key):
-            value = getattr(reviewer.config, key)
+        config = load_config(Path.cwd())
+        if hasattr(config, key):
+            value = getattr(config, key)
             click.echo(f"{key}={value}")
         else:
             click.echo(f"Error: Unknown configuration key: {key}", err=True)
@@ -498,8 +1420,10 @@ def config_get(key: str):
 def config_list():
     """List all configuration values"""
     try:
-        reviewer = CodeReviewer()
-        config_dict = reviewer.config.to_dict()
+        from rich.console import Console
+        from rich.table import Table
+
+        config_dict = load_config(Path.cwd()).to_dict()
         table = Table(title="Current Configuration")
         table.add_column("Key", style="cyan")
         table.add_column("Value", style="green")
@@ -507,7 +1431,7 @@ def config_list():
         for key, value in config_dict.items():
             table.add_row(key, str(value))
 
-        reviewer.console.print(table)
+        Console().print(table)
     except click.ClickException as err:
         click.echo(f"Error: {str(err)}", err=True)
 
@@ -1,5 +1,12 @@
+import asyncio
 import json
-from unittest.mock import Mock, PropertyMock, patch
+import os
+import re
+import stat
+import threading
+from itertools import takewhile
+from pathlib import Path
+from unittest.mock import AsyncMock, Mock, PropertyMock, patch
 
 import click
 import git
@@ -14,10 +21,25 @@ from coderev.main import (
     CodeReviewer,
     Config,
     GitHandler,
+    ResponseCache,
     cli,
+    compact_diff,
+    load_config,
+    save_config,
 )
 
 
+@pytest.fixture(autouse=True)
+def mock_import_litellm():
+    """Keep reviews from importing litellm on a background thread during tests"""
+    with patch("coderev.main._import_litellm") as mock_import:
+        yield mock_import
+        # Finish the warm-ups before the real import is back in place
+        for thread in threading.enumerate():
+            if thread.name == "coderev-import-litellm":
+                thread.join()
+
+
 @pytest.fixture
 def mock_repo():
     """Create a mock git.Repo instance with required attributes"""
@@ -28,7 +50,7 @@ def mock_repo():
 
     # Mock git command interface
     mock_git = Mock()
-    mock_git.diff.return_value = "mock diff content"
+    mock_git.diff.return_value = b"mock diff content"
     type(mock).git = PropertyMock(return_value=mock_git)
 
     # Mock working_dir property
@@ -38,6 +60,7 @@ def mock_repo():
     class MockHead:
         def __init__(self, name):
             self.name = name
+            self.commit = Mock(hexsha=f"{name}-0123456789")
 
         def __eq__(self, other):
             return self.name == other
@@ -47,12 +70,14 @@ def mock_repo():
 
     mock.heads = [MockHead("main"), MockHead("feature-branch")]
 
-    # Mock tree for file existence checks
-    mock_tree = Mock()
-    mock_tree.traverse.return_value = [Mock(path="test.py"), Mock(path="file1.py")]
-    mock.tree.return_value = mock_tree
+    # Mock tracked files for file existence checks
+    mock_git.ls_tree.return_value = "test.py\0file1.py\0"
 
-    return mock
+    # Mock the ref lookups used to key the diff cache
+    with patch("git.refs.SymbolicReference.dereference_recursive") as mock_dereference:
+        mock_dereference.side_effect = lambda repo, ref: f"{ref.rsplit('/', 1)[-1]}-sha"
+        mock.dereference = mock_dereference
+        yield mock
 
 
 @pytest.fixture
@@ -106,9 +131,25 @@ def test_git_handler_default_base_branch(git_handler):
     assert git_handler.get_default_base_branch() == "main"
 
 
+def test_git_handler_resolve_base_branch(git_handler):
+    """Test resolving the base branch once, falling back from main to master"""
+    assert git_handler.resolve_base_branch("main") == "main"
+    assert git_handler.resolve_base_branch("develop") == "develop"
+
+    handler = GitHandler.__new__(GitHandler)
+    handler.repo = Mock(heads=[Mock(), Mock()])
+    handler.repo.heads[0].name = "master"
+    handler.repo.heads[1].name = "feature-branch"
+    assert handler.resolve_base_branch("main") == "master"
+    assert handler.resolve_base_branch(None) == "master"
+    # Branch names are read from the repository only once
+    handler.repo.heads = []
+    assert handler.resolve_base_branch(None) == "master"
+
+
 def test_git_handler_get_changed_files(git_handler):
     """Test getting changed files between branches"""
-    git_handler.repo.git.diff.return_value = "file1.py\nfile2.py\n"
+    git_handler.repo.git.diff.return_value = "file1.py\0file2.py\0"
     files = git_handler.get_changed_files("feature-branch", "main")
     assert files == ["file1.py", "file2.py"]
 
@@ -148,12 +189,21 @@ def test_config_serialization():
     assert new_config.review_instructions == config.review_instructions
 
 
+def test_config_from_dict_parses_boolean_strings():
+    """Test boolean fields written as strings load as the boolean they spell"""
+    assert Config.from_dict({"stream": "false"}).stream is False
+    assert Config.from_dict({"stream": "Off"}).stream is False
+    assert Config.from_dict({"stream": "yes"}).stream is True
+    assert Config.from_dict({"stream": "maybe"}).stream is Config().stream
+    assert Config.from_dict({"stream": 1}).stream is True
+
+
 def test_cli_init_command(tmp_path):
     """Test the init command"""
     runner = CliRunner()
-    with runner.isolated_filesystem():
+    with runner.isolated_filesystem(temp_dir=tmp_path) as repo_dir:
         mock_repo = Mock(spec=git.Repo)
-        type(mock_repo).working_dir = PropertyMock(return_value=str(tmp_path))
+        type(mock_repo).working_dir = PropertyMock(return_value=repo_dir)
 
         with patch("git.Repo") as mock_git_repo:
             mock_git_repo.return_value = mock_repo
@@ -161,7 +211,7 @@ def test_cli_init_command(tmp_path):
 
             assert result.exit_code == 0
             assert "Coderev initialized successfully!" in result.output
-            assert (tmp_path / ".coderev.config").exists()
+            assert (Path(repo_dir) / ".coderev.config").exists()
 
 
 def test_cli_review_command(reviewer, mock_repo):
@@ -169,11 +219,12 @@ def test_cli_review_command(reviewer, mock_repo):
     runner = CliRunner()
 
     # Prepare the git mock for review
-    mock_repo.git.diff.return_value = "mock diff content"
-    reviewer.git.get_changed_files = Mock(return_value=["file1.py"])
+    mock_repo.git.diff.return_value = (
+        b":100644 100644 abc123 def456 M\0file1.py\0\0mock diff content"
+    )
 
     with patch("coderev.main.CodeReviewer") as mock_reviewer_class, patch(
-        "coderev.main.completion"
+        "litellm.acompletion", new_callable=AsyncMock
     ) as mock_completion:
         mock_reviewer_class.return_value = reviewer
         mock_completion.return_value = Mock(
@@ -205,25 +256,165 @@ def test_cli_review_command(reviewer, mock_repo):
         assert "Mock review content" in result.output
 
 
+def test_cli_review_per_file(reviewer, mock_repo):
+    """Test the --per-file option reviews every changed file separately"""
+    runner = CliRunner()
+    reviewer.use_cache = False
+    mock_repo.git.diff.return_value = (
+        b":100644 100644 abc123 def456 M\0file1.py\0"
+        b":100644 100644 abc123 def456 M\0file2.py\0"
+        b"\0"
+        b"diff --git a/file1.py b/file1.py\n+one\n"
+        b"diff --git a/file2.py b/file2.py\n+two"
+    )
+
+    with patch("coderev.main.CodeReviewer") as mock_reviewer_class, patch(
+        "litellm.acompletion", new_callable=AsyncMock
+    ) as mock_completion:
+        mock_reviewer_class.return_value = reviewer
+        mock_completion.return_value = Mock(choices=[Mock(message=Mock(content="Fine"))])
+
+        result = runner.invoke(cli, ["review", "feature-branch", "--per-file"])
+        assert result.exit_code == 0
+        assert mock_completion.call_count == 2
+        assert mock_repo.git.diff.call_count == 1
+        assert "## file1.py" in result.output
+        assert "## file2.py" in result.output
+
+
+def test_cli_review_many(reviewer):
+    """Test reviewing several branches concurrently, reporting failures per branch"""
+    runner = CliRunner()
+    reviewer.use_cache = False
+
+    def get_diff_and_files(branch_name, base_branch, files):
+        if branch_name == "broken-branch":
+            raise click.ClickException("No changes found")
+        return ["file1.py"], f"diff of {branch_name}"
+
+    reviewer.git.get_diff_and_files = Mock(side_effect=get_diff_and_files)
+    reviewer.git.list_branches = Mock(
+        return_value=["main", "feature-branch", "other-branch", "broken-branch"]
+    )
+
+    with patch("coderev.main.CodeReviewer") as mock_reviewer_class, patch(
+        "litellm.acompletion", new_callable=AsyncMock
+    ) as mock_completion:
+        mock_reviewer_class.return_value = reviewer
+        mock_completion.return_value = Mock(choices=[Mock(message=Mock(content="Fine"))])
+
+        result = runner.invoke(cli, ["review-many", "--all"])
+        assert result.exit_code == 0
+        assert mock_completion.call_count == 2
+        assert "## feature-branch\n\nFine" in result.output
+        assert "## other-branch\n\nFine" in result.output
+        assert "Error: No changes found" in result.output
+        assert "## main" not in result.output
+
+        result = runner.invoke(cli, ["review-many"])
+        assert "Specify the branches to review" in result.output
+
+
+def test_cli_review_stream(reviewer, mock_repo):
+    """Test streaming the review to the console as tokens arrive"""
+    runner = CliRunner()
+    reviewer.debug = False
+    reviewer.use_cache = False
+    mock_repo.git.diff.return_value = (
+        b":100644 100644 abc123 def456 M\0file1.py\0\0mock diff content"
+    )
+
+    async def mock_stream():
+        for token in ["Mock ", "streamed ", None, "review"]:
+            yield Mock(choices=[Mock(delta=Mock(content=token))])
+
+    with patch("coderev.main.CodeReviewer") as mock_reviewer_class, patch(
+        "litellm.acompletion", new_callable=AsyncMock
+    ) as mock_completion:
+        mock_reviewer_class.return_value = reviewer
+        mock_completion.return_value = mock_stream()
+
+        result = runner.invoke(cli, ["review", "feature-branch", "--stream"])
+        assert result.exit_code == 0
+        assert mock_completion.call_args[1]["stream"] is True
+        assert result.output.count("Mock streamed review") == 1
+
+        # The stream config is used when no flag is given
+        reviewer.config.stream = True
+        mock_completion.return_value = mock_stream()
+        result = runner.invoke(cli, ["review", "feature-branch"])
+        assert result.exit_code == 0
+        assert mock_completion.call_args[1]["stream"] is True
+
+        mock_completion.return_value = Mock(choices=[Mock(message=Mock(content="Buffered"))])
+        result = runner.invoke(cli, ["review", "feature-branch", "--no-stream"])
+        assert result.exit_code == 0
+        assert mock_completion.call_args[1]["stream"] is False
+
+
 def test_cli_list_branches(reviewer, mock_repo):
     """Test the list branches command"""
     runner = CliRunner()
 
     with patch("coderev.main.CodeReviewer") as mock_reviewer_class, patch(
         "rich.table.Table.add_row"
-    ):
+    ) as mock_add_row:
         mock_reviewer_class.return_value = reviewer
         result = runner.invoke(cli, ["list"])
         assert result.exit_code == 0
+        mock_add_row.assert_any_call("feature-branch", "✓", "feature")
+        mock_add_row.assert_any_call("main", "", "main-01")
+
+
+def test_cli_shell_reuses_reviewer(reviewer):
+    """Test the shell runs several commands with a single reviewer"""
+    runner = CliRunner()
+
+    with patch("coderev.main.CodeReviewer") as mock_reviewer_class, patch(
+        "rich.table.Table.add_row"
+    ) as mock_add_row:
+        mock_reviewer_class.return_value = reviewer
+        result = runner.invoke(cli, ["shell"], input="list\nlist --bogus\nlist\nexit\n")
+
+        assert result.exit_code == 0
+        mock_reviewer_class.assert_called_once_with()
+        assert mock_add_row.call_count == 4
+        assert "--bogus" in result.output
+
+
+def test_cli_shell_keeps_reviewer_debug(reviewer):
+    """Test --debug lasts for one shell command and debug from the environment stays on"""
+    runner = CliRunner()
+    seen_debug = []
+
+    async def mock_review(*args, **kwargs):
+        seen_debug.append(reviewer.debug)
+        return "Mock review"
+
+    reviewer.review_branch = Mock(side_effect=mock_review)
+    with patch("coderev.main.CodeReviewer") as mock_reviewer_class:
+        mock_reviewer_class.return_value = reviewer
+
+        reviewer.debug = False
+        commands = "review feature-branch --debug\nreview feature-branch\nexit\n"
+        result = runner.invoke(cli, ["shell"], input=commands)
+        assert result.exit_code == 0
+        assert seen_debug == [True, False]
+
+        seen_debug.clear()
+        reviewer.debug = True
+        result = runner.invoke(cli, ["shell"], input="review feature-branch\nexit\n")
+        assert result.exit_code == 0
+        assert seen_debug == [True]
 
 
 def test_config_commands(tmp_path):
     """Test configuration commands"""
     runner = CliRunner()
-    with runner.isolated_filesystem():
+    with runner.isolated_filesystem(temp_dir=tmp_path) as repo_dir:
         # Setup mock repo
         mock_repo = Mock(spec=git.Repo)
-        type(mock_repo).working_dir = PropertyMock(return_value=str(tmp_path))
+        type(mock_repo).working_dir = PropertyMock(return_value=repo_dir)
 
         with patch("git.Repo") as mock_git_repo:
             mock_git_repo.return_value = mock_repo
@@ -242,22 +433,336 @@ def test_config_commands(tmp_path):
             assert "new-model" in result.output
 
 
+def test_config_commands_without_git_repo(tmp_path):
+    """Test configuration commands only touch the config file, not the git repo"""
+    runner = CliRunner()
+    with runner.isolated_filesystem(temp_dir=tmp_path), patch("git.Repo") as mock_git_repo:
+        result = runner.invoke(cli, ["config", "set", "model", "new-model"])
+        assert result.exit_code == 0
+
+        result = runner.invoke(cli, ["config", "get", "model"])
+        assert result.exit_code == 0
+        assert "model=new-model" in result.output
+
+        result = runner.invoke(cli, ["config", "list"])
+        assert result.exit_code == 0
+
+        mock_git_repo.assert_not_called()
+
+
+def test_load_config_reuses_unchanged_file(tmp_path):
+    """Test the config file is parsed again only after it changes"""
+    save_config(tmp_path, Config(model="first-model"))
+    assert [path.name for path in tmp_path.iterdir()] == [".coderev.config"]
+
+    with patch("coderev.main._json_loads", wraps=json.loads) as mock_loads:
+        config = load_config(tmp_path)
+        config.model = "changed-in-memory"
+        assert load_config(tmp_path).model == "first-model"
+        assert mock_loads.call_count == 1
+
+        save_config(tmp_path, Config(model="second-model"))
+        assert load_config(tmp_path).model == "second-model"
+        assert mock_loads.call_count == 2
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX file modes")
+def test_save_config_keeps_file_mode(tmp_path):
+    """Test saving the config keeps its permissions, or uses the umask for a new file"""
+    umask = os.umask(0o022)
+    try:
+        save_config(tmp_path, Config())
+        config_path = tmp_path / ".coderev.config"
+        assert stat.S_IMODE(config_path.stat().st_mode) == 0o644
+
+        config_path.chmod(0o640)
+        save_config(tmp_path, Config(model="second-model"))
+        assert stat.S_IMODE(config_path.stat().st_mode) == 0o640
+    finally:
+        os.umask(umask)
+
+
+def test_save_config_removes_temporary_file_on_failure(tmp_path):
+    """Test a failed save leaves the existing config and no temporary file behind"""
+    save_config(tmp_path, Config(model="first-model"))
+
+    with patch("coderev.main.os.replace", side_effect=OSError("disk full")):
+        with pytest.raises(click.ClickException, match="disk full"):
+            save_config(tmp_path, Config(model="second-model"))
+
+    assert [path.name for path in tmp_path.iterdir()] == [".coderev.config"]
+    assert load_config(tmp_path).model == "first-model"
+
+
+def test_config_set_coerces_field_types(tmp_path):
+    """Test config set stores values with the type of their config field"""
+    runner = CliRunner()
+    with runner.isolated_filesystem(temp_dir=tmp_path) as repo_dir:
+        result = runner.invoke(cli, ["config", "set", "max_diff_bytes", "1000"])
+        assert result.exit_code == 0
+        config_data = json.loads((Path(repo_dir) / ".coderev.config").read_text())
+        assert config_data["max_diff_bytes"] == 1000
+
+        result = runner.invoke(cli, ["config", "set", "max_diff_bytes", "lots"])
+        assert result.exit_code != 0
+        assert "must be a whole number" in result.output
+
+        result = runner.invoke(cli, ["config", "set", "to_dict", "x"])
+        assert result.exit_code != 0
+        assert "Unknown configuration key" in result.output
+
+
 def test_review_branch_with_files(reviewer):
     """Test reviewing specific files in a branch"""
     # Mock the git operations more thoroughly
-    reviewer.git.repo.git.diff.return_value = "mock diff content"
-    reviewer.git.get_changed_files = Mock(return_value=["file1.py", "file2.py"])
-    reviewer.git.get_branch_diff = Mock(return_value="mock diff content")
+    reviewer.git.repo.git.diff.return_value = b"mock diff content"
+    reviewer.git.get_diff_and_files = Mock(return_value=(["test.py"], "mock diff content"))
 
-    with patch("coderev.main.completion") as mock_completion:
+    with patch("litellm.acompletion", new_callable=AsyncMock) as mock_completion:
         mock_completion.return_value = Mock(
             choices=[Mock(message=Mock(content="Mock review for specific files"))]
         )
 
-        result = reviewer.review_branch("feature-branch", base_branch="main", files=["test.py"])
+        result = asyncio.run(
+            reviewer.review_branch("feature-branch", base_branch="main", files=["test.py"])
+        )
         assert "Mock review for specific files" in result
 
 
+def test_review_files_runs_one_request_per_file(reviewer):
+    """Test reviewing several files issues one concurrent request per file"""
+    reviewer.git.get_diff_and_files = Mock(
+        return_value=(
+            ["a.py", "b.py"],
+            "diff --git a/a.py b/a.py\n+diff a.py\ndiff --git a/b.py b/b.py\n+diff b.py\n",
+        )
+    )
+
+    with patch("litellm.acompletion", new_callable=AsyncMock) as mock_completion:
+        mock_completion.return_value = Mock(choices=[Mock(message=Mock(content="Looks good"))])
+
+        result = asyncio.run(
+            reviewer.review_files("feature-branch", base_branch="main", files=["a.py", "b.py"])
+        )
+
+    # The diff is read once and split per file
+    reviewer.git.get_diff_and_files.assert_called_once_with(
+        "feature-branch", "main", ["a.py", "b.py"]
+    )
+    assert mock_completion.call_count == 2
+    prompts = [call[1]["messages"][1]["content"] for call in mock_completion.call_args_list]
+    assert any("diff a.py" in prompt and "diff b.py" not in prompt for prompt in prompts)
+    assert any("diff b.py" in prompt and "diff a.py" not in prompt for prompt in prompts)
+    assert "## a.py\n\nLooks good" in result
+    assert "## b.py\n\nLooks good" in result
+
+
+def _assert_hunk_headers_match(diff):
+    """Check every hunk header counts the lines of the body below it"""
+    hunks = re.split(r"^(@@ .*)$", diff, flags=re.MULTILINE)[1:]
+    for header, body in zip(hunks[::2], hunks[1::2]):
+        match = re.match(r"@@ -\d+(?:,(\d+))? \+\d+(?:,(\d+))? @@", header)
+        old_count, new_count = (int(count or 1) for count in match.groups())
+        lines = list(
+            takewhile(lambda line: line[:1] in (" ", "-", "+", "\\"), body.split("\n")[1:])
+        )
+        assert old_count == sum(line[:1] in (" ", "-") for line in lines), header
+        assert new_count == sum(line[:1] in (" ", "+") for line in lines), header
+
+
+def test_compact_diff():
+    """Test index lines and blank context lines at hunk edges are dropped from the diff"""
+    diff = (
+        "diff --git a/a.py b/a.py\n"
+        "index abc123..def456 100644\n"
+        "--- a/a.py\n"
+        "+++ b/a.py\n"
+        "@@ -1,8 +1,8 @@\n"
+        " \n"
+        " def f():\n"
+        "-    return 1\n"
+        "+    return 2\n"
+        " \n"
+        " \n"
+        " def g():\n"
+        " \n"
+        " \n"
+        "@@ -20,4 +20,3 @@ def h():\n"
+        " \n"
+        "-x = 1\n"
+        " \n"
+        " \n"
+        "diff --git a/bin.dat b/bin.dat\n"
+        "index 111..222 100644\n"
+        "Binary files a/bin.dat and b/bin.dat differ"
+    )
+    _assert_hunk_headers_match(diff)
+
+    compacted = compact_diff(diff)
+
+    assert compacted == (
+        "diff --git a/a.py b/a.py\n"
+        "--- a/a.py\n"
+        "+++ b/a.py\n"
+        "@@ -2,5 +2,5 @@\n"
+        " def f():\n"
+        "-    return 1\n"
+        "+    return 2\n"
+        " \n"
+        " \n"
+        " def g():\n"
+        "@@ -21 +20,0 @@ def h():\n"
+        "-x = 1\n"
+        "diff --git a/bin.dat b/bin.dat\n"
+        "Binary files a/bin.dat and b/bin.dat differ"
+    )
+    _assert_hunk_headers_match(compacted)
+
+
+def test_review_files_dedupes_identical_changes(reviewer):
+    """Test files with identical hunks are reviewed with a single request"""
+    reviewer.use_cache = False
+    reviewer.git.get_diff_and_files = Mock(
+        return_value=(
+            ["a.lock", "b.lock", "c.py"],
+            "diff --git a/a.lock b/a.lock\n@@ -1 +1 @@\n-v1\n+v2\n"
+            "diff --git a/b.lock b/b.lock\n@@ -1 +1 @@\n-v1\n+v2\n"
+            "diff --git a/c.py b/c.py\n@@ -1 +1 @@\n-a\n+b\n",
+        )
+    )
+
+    with patch("litellm.acompletion", new_callable=AsyncMock) as mock_completion:
+        mock_completion.return_value = Mock(choices=[Mock(message=Mock(content="Looks good"))])
+
+        result = asyncio.run(reviewer.review_files("feature-branch", base_branch="main"))
+
+    assert mock_completion.call_count == 2
+    assert "## a.lock\n\nLooks good" in result
+    assert "## b.lock\n\nLooks good" in result
+    assert "## c.py\n\nLooks good" in result
+
+
+def test_review_branch_splits_large_diff(reviewer):
+    """Test a diff over max_diff_bytes is reviewed in concurrent chunks of whole files"""
+    reviewer.use_cache = False
+    reviewer.config.max_diff_bytes = 80
+    diff = (
+        "diff --git a/a.py b/a.py\n+diff a.py\n"
+        "diff --git a/b.py b/b.py\n+diff b.py\n"
+        "diff --git a/c.py b/c.py\n+diff c.py\n"
+    )
+    reviewer.git.get_diff_and_files = Mock(return_value=(["a.py", "b.py", "c.py"], diff))
+
+    with patch("litellm.acompletion", new_callable=AsyncMock) as mock_completion:
+        mock_completion.return_value = Mock(choices=[Mock(message=Mock(content="Looks good"))])
+
+        result = asyncio.run(reviewer.review_branch("feature-branch", base_branch="main"))
+
+    assert mock_completion.call_count == 2
+    prompts = [call[1]["messages"][1]["content"] for call in mock_completion.call_args_list]
+    assert any("diff a.py" in prompt and "diff b.py" in prompt for prompt in prompts)
+    assert any("diff c.py" in prompt and "diff a.py" not in prompt for prompt in prompts)
+    assert "## Part 1 of 2: a.py, b.py\n\nLooks good" in result
+    assert "## Part 2 of 2: c.py\n\nLooks good" in result
+
+
+def test_review_warms_up_litellm(reviewer, mock_import_litellm):
+    """Test litellm is imported alongside the git diff and awaited only on a cache miss"""
+    reviewer.git.get_diff_and_files = Mock(return_value=(["file1.py"], "mock diff content"))
+    mock_import = mock_import_litellm
+
+    with patch("litellm.acompletion", new_callable=AsyncMock) as mock_completion:
+        mock_completion.return_value = Mock(choices=[Mock(message=Mock(content="Review"))])
+
+        reviewer.cache = Mock(get=Mock(return_value="Cached review"))
+        asyncio.run(reviewer.review_branch("feature-branch", base_branch="main"))
+        mock_import.assert_called_once_with()
+        mock_completion.assert_not_called()
+
+        # The import is started once per reviewer
+        reviewer.use_cache = False
+        assert asyncio.run(reviewer.review_branch("feature-branch", base_branch="main")) == (
+            "Review"
+        )
+        mock_import.assert_called_once_with()
+
+
+def test_review_litellm_import_errors(reviewer, mock_import_litellm):
+    """Test errors from the background litellm import are reported by the review"""
+    reviewer.use_cache = False
+    reviewer.git.get_diff_and_files = Mock(return_value=(["file1.py"], "mock diff content"))
+    mock_import = mock_import_litellm
+
+    with patch("litellm.acompletion", new_callable=AsyncMock) as mock_completion:
+        mock_completion.return_value = Mock(choices=[Mock(message=Mock(content="Review"))])
+
+        # A missing module is left for the import where litellm is used
+        mock_import.side_effect = ImportError("No module named 'litellm'")
+        assert asyncio.run(reviewer.review_branch("feature-branch", base_branch="main")) == (
+            "Review"
+        )
+
+        reviewer._llm_import = None
+        mock_import.side_effect = RuntimeError("bad litellm config")
+        with pytest.raises(click.ClickException, match="bad litellm config"):
+            asyncio.run(reviewer.review_branch("feature-branch", base_branch="main"))
+
+        # The next review tries the import again
+        mock_import.side_effect = None
+        assert asyncio.run(reviewer.review_branch("feature-branch", base_branch="main")) == (
+            "Review"
+        )
+        assert mock_import.call_count == 3
+
+
+def test_review_response_cache(reviewer, tmp_path):
+    """Test identical prompts are answered from the on-disk response cache"""
+    reviewer.cache = ResponseCache(tmp_path / ".coderev.cache.db")
+    reviewer.git.get_diff_and_files = Mock(return_value=(["file1.py"], "mock diff content"))
+
+    with patch("litellm.acompletion", new_callable=AsyncMock) as mock_completion:
+        mock_completion.return_value = Mock(choices=[Mock(message=Mock(content="Cached review"))])
+
+        first = asyncio.run(reviewer.review_branch("feature-branch", base_branch="main"))
+        second = asyncio.run(reviewer.review_branch("feature-branch", base_branch="main"))
+        assert first == second == "Cached review"
+        assert mock_completion.call_count == 1
+
+        # A different temperature is a different cache entry
+        reviewer.config.temperature = 0.5
+        asyncio.run(reviewer.review_branch("feature-branch", base_branch="main"))
+        assert mock_completion.call_count == 2
+
+        # Bypassing the cache always calls the LLM
+        reviewer.use_cache = False
+        asyncio.run(reviewer.review_branch("feature-branch", base_branch="main"))
+        assert mock_completion.call_count == 3
+
+
+def test_format_review_content(reviewer):
+    """Test extracting the review from a JSON code block in the LLM response"""
+    wrapped = 'Here you go:\n```json\n{"response": "## Review\\nLooks good"}\n```\n'
+    assert reviewer._format_review_content(wrapped) == "## Review\nLooks good"
+
+    padded = '```json\n{"response": "\\n## Review\\n\\n"}\n```'
+    assert reviewer._format_review_content(padded) == "## Review"
+
+    plain = "  ## Review\n```python\nprint(1)\n```\n"
+    assert reviewer._format_review_content(plain) == "## Review\n```python\nprint(1)\n```"
+
+    invalid = '```json\n{"response": oops}\n```'
+    assert reviewer._format_review_content(invalid) == invalid
+
+
+def test_debug_print_plain_when_not_terminal(reviewer, capsys):
+    """Test debug output skips rich formatting when stdout is not a terminal"""
+    with patch.object(type(reviewer.console), "is_terminal", new_callable=PropertyMock) as tty:
+        tty.return_value = False
+        reviewer._debug_print("User Message", "diff --git a/x b/x", lexer="diff")
+
+    assert capsys.readouterr().out == "--- User Message ---\ndiff --git a/x b/x\n"
+
+
 def test_model_validation(reviewer):
     """Test different model configurations and error handling"""
     import os
@@ -289,45 +794,45 @@ def test_model_validation(reviewer):
         # Test missing API key error
         with pytest.raises(click.ClickException) as exc_info:
             reviewer.config.model = "gpt-4o"
-            reviewer.review_branch("feature-branch")
+            asyncio.run(reviewer.review_branch("feature-branch"))
         assert (
             "The api_key client option must be set either by passing api_key to the client or by setting the OPENAI_API_KEY environment variable"
             in str(exc_info.value)
         )
 
         # Test with valid OpenAI setup
-        with patch("coderev.main.completion") as mock_completion:
+        with patch("litellm.acompletion", new_callable=AsyncMock) as mock_completion:
             mock_completion.return_value = mock_response
             os.environ["OPENAI_API_KEY"] = "mock-key"
 
             reviewer.config.model = "gpt-4o"
-            result = reviewer.review_branch("feature-branch")
+            result = asyncio.run(reviewer.review_branch("feature-branch"))
             assert "Mock review content" in result
 
             reviewer.config.model = "o1-mini"
-            result = reviewer.review_branch("feature-branch")
+            result = asyncio.run(reviewer.review_branch("feature-branch"))
             assert "Mock review content" in result
 
         # Test with valid Anthropic setup
-        with patch("coderev.main.completion") as mock_completion:
+        with patch("litellm.acompletion", new_callable=AsyncMock) as mock_completion:
             mock_completion.return_value = mock_response
             os.environ["ANTHROPIC_API_KEY"] = "mock-key"
 
             reviewer.config.model = "claude-3-sonnet-20240320"
-            result = reviewer.review_branch("feature-branch")
+            result = asyncio.run(reviewer.review_branch("feature-branch"))
             assert "Mock review content" in result
 
         # Test with Ollama (no API key needed)
-        with patch("coderev.main.completion") as mock_completion:
+        with patch("litellm.acompletion", new_callable=AsyncMock) as mock_completion:
             mock_completion.return_value = mock_response
             reviewer.config.model = "ollama/qwen2.5-coder"
-            result = reviewer.review_branch("feature-branch")
+            result = asyncio.run(reviewer.review_branch("feature-branch"))
             assert "Mock review content" in result
 
         # Test invalid model name
         with pytest.raises(click.ClickException) as exc_info:
             reviewer.config.model = "invalid-model"
-            reviewer.review_branch("feature-branch")
+            asyncio.run(reviewer.review_branch("feature-branch"))
         assert "Error during review" in str(exc_info.value)
 
     finally:
@@ -369,6 +874,119 @@ def test_git_handler_same_branch_error(git_handler):
     assert "feature-123" in error_message  # Should show real branch name in example
 
 
+def test_git_handler_get_diff_and_files(git_handler):
+    """Test getting changed files and the patch from a single git diff call"""
+    git_handler.repo.git.diff.return_value = (
+        b":100644 100644 abc123 def456 M\0file1.py\0"
+        b":100644 100644 abc123 def456 R100\0old.py\0new.py\0"
+        b"\0"
+        b"diff --git a/file1.py b/file1.py\n+change"
+    )
+
+    files, diff = git_handler.get_diff_and_files("feature-branch", "main")
+
+    assert files == ["file1.py", "new.py"]
+    assert diff == "diff --git a/file1.py b/file1.py\n+change"
+    git_handler.repo.git.diff.assert_called_once_with(
+        "main...feature-branch",
+        "--find-renames",
+        "--patch-with-raw",
+        "-z",
+        "--",
+        ":(exclude,glob)**/node_modules/**",
+        ":(exclude,glob)**/*.min.js",
+        ":(exclude,glob)**/*.lock",
+        stdout_as_string=False,
+    )
+
+
+def test_response_cache_prunes_old_entries(tmp_path):
+    """Test responses older than the maximum age are dropped when the cache is opened"""
+    cache = ResponseCache(tmp_path / ".coderev.cache.db")
+    cache.set(b"old", "Old review")
+    cache.set(b"new", "New review")
+    with cache._connect() as conn:
+        conn.execute("UPDATE cache SET ts = 0 WHERE key = ?", (b"old",))
+
+    reopened = ResponseCache(tmp_path / ".coderev.cache.db", max_age_days=1)
+    assert reopened.get(b"old") is None
+    assert reopened.get(b"new") == "New review"
+
+
+def test_git_handler_diff_cache(git_handler):
+    """Test diffs are reused until the commits change or the cache is invalidated"""
+    assert git_handler.get_branch_diff("feature-branch", "main") == "mock diff content"
+    assert git_handler.get_branch_diff("feature-branch", "main") == "mock diff content"
+    assert git_handler.repo.git.diff.call_count == 1
+    # The cache key is read from the refs without asking git
+    git_handler.repo.commit.assert_not_called()
+
+    # A new commit on the branch changes the cache key
+    git_handler.repo.dereference.side_effect = lambda repo, ref: f"{ref}-new-sha"
+    git_handler.get_branch_diff("feature-branch", "main")
+    assert git_handler.repo.git.diff.call_count == 2
+
+    git_handler.invalidate()
+    git_handler.get_branch_diff("feature-branch", "main")
+    assert git_handler.repo.git.diff.call_count == 3
+
+
+def test_git_handler_diff_invalid_utf8(git_handler):
+    """Test diffs of non UTF-8 files are decoded with replacement characters"""
+    git_handler.repo.git.diff.return_value = b"diff --git a/l1.txt b/l1.txt\n+caf\xe9"
+
+    diff = git_handler.get_branch_diff("feature-branch", "main")
+
+    assert diff == "diff --git a/l1.txt b/l1.txt\n+caf\ufffd"
+    assert diff.encode("utf-8")
+
+
+def test_git_handler_no_changes_short_circuit(git_handler):
+    """Test branches pointing to the same commit are detected without running git diff"""
+    git_handler.repo.dereference.side_effect = lambda repo, ref: "same-sha"
+    with pytest.raises(click.ClickException, match="No changes found"):
+        git_handler.get_branch_diff("feature-branch", "main")
+
+    git_handler.repo.git.diff.assert_not_called()
+
+
+def test_git_handler_missing_file_error(git_handler):
+    """Test files that match nothing in the branch are reported when the diff is empty"""
+    git_handler.repo.git.ls_tree.return_value = "file1.py\0"
+    git_handler.repo.git.diff.return_value = b""
+
+    with pytest.raises(click.ClickException) as exc_info:
+        git_handler.get_branch_diff("feature-branch", "main", ["file1.py", "missing.py"])
+
+    assert "File 'missing.py' not found" in str(exc_info.value)
+
+    # All missing files are reported together
+    with pytest.raises(click.ClickException) as exc_info:
+        git_handler.get_branch_diff("feature-branch", "main", ["typo1.py", "file1.py", "typo2.py"])
+
+    assert "Files not found in repository: typo1.py, typo2.py" in str(exc_info.value)
+
+    # Files that exist but didn't change are not reported as missing
+    with pytest.raises(click.ClickException, match="for the specified files: ./file1.py"):
+        git_handler.get_branch_diff("feature-branch", "main", ["./file1.py"])
+
+
+def test_git_handler_files_are_pathspecs(git_handler):
+    """Test -f values are passed to git diff as pathspecs without listing the tree first"""
+    assert git_handler.get_branch_diff("feature-branch", "main", ["*.txt", "./f.txt", "src/app/"])
+
+    assert git_handler.repo.git.diff.call_args[0][-3:] == ("*.txt", "./f.txt", "src/app/")
+    git_handler.repo.git.ls_tree.assert_not_called()
+
+    # Globs, directories and ./ prefixes match the files they cover
+    git_handler.repo.git.ls_tree.return_value = "docs/a.txt\0src/app/main.py\0"
+    git_handler.repo.git.diff.return_value = b""
+    with pytest.raises(click.ClickException, match="File 'lib/' not found"):
+        git_handler.get_branch_diff(
+            "feature-branch", "main", ["*.txt", "./docs/a.txt", "src/app/", "lib/"]
+        )
+
+
 def test_git_handler_base_branch_fallback(git_handler):
     """Test fallback from main to master when main doesn't exist"""
 
@@ -381,7 +999,9 @@ def test_git_handler_base_branch_fallback(git_handler):
                 stderr="fatal: ambiguous argument 'coderev.main...feature-branch': unknown revision or path not in the working tree.",
             )
         elif "master..." in args[0]:
-            return "file1.py\nfile2.py"
+            if kwargs.get("stdout_as_string") is False:
+                return b"file1.py\nfile2.py"
+            return "file1.py\0file2.py"
         return ""
 
     git_handler.repo.git.diff = Mock(side_effect=mock_diff)
@@ -439,13 +1059,13 @@ def test_system_message_cli_command(tmp_path, git_handler):
     """Test system message via CLI command"""
     runner = CliRunner()
 
-    with runner.isolated_filesystem():
+    with runner.isolated_filesystem(temp_dir=tmp_path) as repo_dir:
         # Setup mock repo and config
         mock_repo = Mock(spec=git.Repo)
-        type(mock_repo).working_dir = PropertyMock(return_value=str(tmp_path))
+        type(mock_repo).working_dir = PropertyMock(return_value=repo_dir)
 
         with patch("git.Repo") as mock_git_repo, patch(
-            "coderev.main.completion"
+            "litellm.acompletion", new_callable=AsyncMock
         ) as mock_completion:
             mock_git_repo.return_value = mock_repo
             mock_completion.return_value = Mock(
@@ -461,7 +1081,7 @@ def test_system_message_cli_command(tmp_path, git_handler):
             assert result.exit_code == 0
 
             # Verify system message was saved
-            config_path = tmp_path / ".coderev.config"
+            config_path = Path(repo_dir) / ".coderev.config"
             config_data = json.loads(config_path.read_text())
             assert config_data["system_message"] == "Custom message"
 
@@ -485,7 +1105,7 @@ def test_system_message_configuration(tmp_path, git_handler):
 
     with patch("pathlib.Path.exists") as mock_exists, patch(
         "pathlib.Path.__truediv__"
-    ) as mock_truediv, patch("coderev.main.completion") as mock_completion:
+    ) as mock_truediv, patch("litellm.acompletion", new_callable=AsyncMock) as mock_completion:
         mock_exists.return_value = True
         mock_truediv.return_value = config_path
         mock_completion.return_value = Mock(
@@ -496,17 +1116,16 @@ def test_system_message_configuration(tmp_path, git_handler):
         reviewer.git = git_handler
 
         # Mock git operations
-        git_handler.get_changed_files = Mock(return_value=["file1.py"])
-        git_handler.get_branch_diff = Mock(return_value="mock diff")
+        git_handler.get_diff_and_files = Mock(return_value=(["file1.py"], "mock diff"))
 
         # Test 1: Using config file system message
-        reviewer.review_branch("feature-branch")
+        asyncio.run(reviewer.review_branch("feature-branch"))
         args = mock_completion.call_args[1]
         assert args["messages"][0]["content"] == "Custom system message from config"
 
         # Test 2: Override with explicit system message
         explicit_msg = "Explicit system message"
-        reviewer.review_branch("feature-branch", system_message=explicit_msg)
+        asyncio.run(reviewer.review_branch("feature-branch", system_message=explicit_msg))
         args = mock_completion.call_args[1]
         assert args["messages"][0]["content"] == explicit_msg
 
@@ -516,7 +1135,7 @@ def test_system_message_configuration(tmp_path, git_handler):
         reviewer = CodeReviewer(debug=True)
         reviewer.git = git_handler
 
-        reviewer.review_branch("feature-branch")
+        asyncio.run(reviewer.review_branch("feature-branch"))
         args = mock_completion.call_args[1]
         assert args["messages"][0]["content"] == DEFAULT_SYSTEM_MESSAGE
 
@@ -536,7 +1155,7 @@ def test_review_instructions_configuration(tmp_path, git_handler):
 
     with patch("pathlib.Path.exists") as mock_exists, patch(
         "pathlib.Path.__truediv__"
-    ) as mock_truediv, patch("coderev.main.completion") as mock_completion:
+    ) as mock_truediv, patch("litellm.acompletion", new_callable=AsyncMock) as mock_completion:
         mock_exists.return_value = True
         mock_truediv.return_value = config_path
         mock_completion.return_value = Mock(
@@ -547,17 +1166,18 @@ def test_review_instructions_configuration(tmp_path, git_handler):
         reviewer.git = git_handler
 
         # Mock git operations
-        git_handler.get_changed_files = Mock(return_value=["file1.py"])
-        git_handler.get_branch_diff = Mock(return_value="mock diff")
+        git_handler.get_diff_and_files = Mock(return_value=(["file1.py"], "mock diff"))
 
         # Test 1: Using config file instructions
-        reviewer.review_branch("feature-branch")
+        asyncio.run(reviewer.review_branch("feature-branch"))
         args = mock_completion.call_args[1]
         assert "Custom instructions from config" in args["messages"][1]["content"]
 
         # Test 2: Override with explicit instructions
         explicit_instructions = "Explicit review instructions"
-        reviewer.review_branch("feature-branch", review_instructions=explicit_instructions)
+        asyncio.run(
+            reviewer.review_branch("feature-branch", review_instructions=explicit_instructions)
+        )
         args = mock_completion.call_args[1]
         assert explicit_instructions in args["messages"][1]["content"]
 
@@ -567,7 +1187,7 @@ def test_review_instructions_configuration(tmp_path, git_handler):
         reviewer = CodeReviewer(debug=True)
         reviewer.git = git_handler
 
-        reviewer.review_branch("feature-branch")
+        asyncio.run(reviewer.review_branch("feature-branch"))
         args = mock_completion.call_args[1]
         assert DEFAULT_REVIEW_INSTRUCTIONS in args["messages"][1]["content"]
 
@@ -577,11 +1197,12 @@ def test_cli_review_with_instructions(reviewer, mock_repo):
     runner = CliRunner()
     custom_instructions = "Focus on performance aspects"
 
-    mock_repo.git.diff.return_value = "mock diff content"
-    reviewer.git.get_changed_files = Mock(return_value=["file1.py"])
+    mock_repo.git.diff.return_value = (
+        b":100644 100644 abc123 def456 M\0file1.py\0\0mock diff content"
+    )
 
     with patch("coderev.main.CodeReviewer") as mock_reviewer_class, patch(
-        "coderev.main.completion"
+        "litellm.acompletion", new_callable=AsyncMock
     ) as mock_completion:
         mock_reviewer_class.return_value = reviewer
         mock_completion.return_value = Mock(
@@ -625,10 +1246,10 @@ def test_cli_command_structure():
 def test_temperature_configuration(tmp_path):
     """Test temperature configuration validation and type conversion"""
     runner = CliRunner()
-    with runner.isolated_filesystem():
+    with runner.isolated_filesystem(temp_dir=tmp_path) as repo_dir:
         # Setup mock repo
         mock_repo = Mock(spec=git.Repo)
-        type(mock_repo).working_dir = PropertyMock(return_value=str(tmp_path))
+        type(mock_repo).working_dir = PropertyMock(return_value=repo_dir)
 
         with patch("git.Repo") as mock_git_repo:
             mock_git_repo.return_value = mock_repo
@@ -645,7 +1266,7 @@ def test_temperature_configuration(tmp_path):
                 assert f"Set temperature={temp}" in result.output
 
                 # Verify temperature is stored as float
-                config_path = tmp_path / ".coderev.config"
+                config_path = Path(repo_dir) / ".coderev.config"
                 config_data = json.loads(config_path.read_text())
                 assert isinstance(config_data["temperature"], float)
                 assert config_data["temperature"] == float(temp)
@@ -675,11 +1296,12 @@ def test_review_with_temperature(reviewer, mock_repo):
     """Test review command with different temperature settings"""
     runner = CliRunner()
 
-    mock_repo.git.diff.return_value = "mock diff content"
-    reviewer.git.get_changed_files = Mock(return_value=["file1.py"])
+    mock_repo.git.diff.return_value = (
+        b":100644 100644 abc123 def456 M\0file1.py\0\0mock diff content"
+    )
 
     with patch("coderev.main.CodeReviewer") as mock_reviewer_class, patch(
-        "coderev.main.completion"
+        "litellm.acompletion", new_callable=AsyncMock
     ) as mock_completion:
         mock_reviewer_class.return_value = reviewer
         mock_completion.return_value = Mock(